@@ -0,0 +1,333 @@
+"""
+Ollama I/O - Shared HTTP helpers for talking to the local Ollama server.
+
+Both clients (routing_client.py and smart_router.py) import from here, so
+they share one keep-alive session, one JSON codec and one model-list cache.
+
+Requires Ollama running locally:
+    ollama serve
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    # Optional: pip install orjson (faster stream parsing). Its JSONDecodeError
+    # subclasses json.JSONDecodeError, so callers can keep catching the latter.
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+try:
+    import httpx  # Optional: pip install httpx (only needed for chat_async)
+except ImportError:
+    httpx = None
+
+OLLAMA_BASE_URL = "http://localhost:11434"
+
+# One keep-alive session for every Ollama call (no new TCP connection per request).
+# requests already sends "Connection: keep-alive" and gzip/deflate by default.
+# Chat POSTs stream tokens, so they must never be retried behind our back.
+SESSION = requests.Session()
+SESSION.mount(
+    "http://", HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=0)
+)
+# A local server is never reached through a proxy, so skip the proxy/netrc
+# environment lookups requests otherwise repeats on every call (~0.3 ms each)
+SESSION.trust_env = urlsplit(OLLAMA_BASE_URL).hostname not in (
+    "localhost",
+    "127.0.0.1",
+    "::1",
+)
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Shared client for chat_async, created on first use. Its connections belong
+# to the event loop it was created in, so it is recreated for a new loop.
+_ASYNC_CLIENT = None
+_ASYNC_CLIENT_LOOP = None
+
+# Streamed output is written in batches (see print_stream)
+STREAM_FLUSH_CHARS = 64
+STREAM_FLUSH_SECONDS = 0.04
+
+# How long warm_models() asks Ollama to keep each model loaded
+WARM_KEEP_ALIVE = "30m"
+
+# Rough prompt budget for a tier's history (~4 characters per token, so
+# about 3000 tokens); see trim_history
+HISTORY_CHAR_BUDGET = 12000
+
+# Installed models change on the order of minutes, so list_models() caches
+MODELS_CACHE_TTL = 30.0  # seconds
+_MODELS_CACHE = {"time": float("-inf"), "models": []}
+
+
+def _post_json(url: str, payload: dict, **kwargs) -> requests.Response:
+    """POST payload as a JSON body, serialized with orjson when available."""
+    return SESSION.post(url, data=_json.dumps(payload), headers=_JSON_HEADERS, **kwargs)
+
+
+def _model_options(temperature: float, options: Optional[dict] = None) -> dict:
+    """
+    Build the "options" object of a request. Ollama reads sampling settings
+    such as temperature only from there; top-level fields are ignored.
+    """
+    if options:
+        return {**options, "temperature": temperature}
+    return {"temperature": temperature}
+
+
+def warm_models(
+    models: list[str],
+    keep_alive: str = WARM_KEEP_ALIVE,
+    options: Optional[dict[str, dict]] = None,
+) -> list[str]:
+    """
+    Load models into memory in parallel, so the first query on each tier
+    doesn't wait for a model load. Returns the models that failed to load.
+
+    options maps a model to the Ollama options its real requests will use.
+    Load-time options such as num_ctx must match, or the first real request
+    reloads the model.
+    """
+    url = f"{OLLAMA_BASE_URL}/api/generate"
+    options = options or {}
+
+    def warm(model: str) -> bool:
+        # A generate request without a prompt only loads the model
+        payload = {"model": model, "keep_alive": keep_alive, "stream": False}
+        if model in options:
+            payload["options"] = options[model]
+        try:
+            response = _post_json(url, payload)
+            response.raise_for_status()
+        except requests.RequestException:
+            return False
+        return True
+
+    with ThreadPoolExecutor(max_workers=max(1, len(models))) as executor:
+        loaded = list(executor.map(warm, models))
+    return [model for model, ok in zip(models, loaded) if not ok]
+
+
+def trim_history(messages, max_chars: int = HISTORY_CHAR_BUDGET) -> None:
+    """
+    Drop the oldest messages (a list or deque) in place until their content
+    fits in max_chars. The newest message is always kept, and the history
+    never starts with an assistant reply whose question was dropped.
+    """
+    total = sum(len(m["content"]) for m in messages)
+    while len(messages) > 1 and (total > max_chars or messages[0]["role"] != "user"):
+        total -= len(messages[0]["content"])
+        del messages[0]
+
+
+def list_models(refresh: bool = False) -> list[str]:
+    """
+    List all available models in local Ollama instance.
+    Results are cached for MODELS_CACHE_TTL seconds; refresh=True forces
+    a new request. Failed requests are not cached.
+    """
+    now = time.monotonic()
+    if not refresh and now - _MODELS_CACHE["time"] < MODELS_CACHE_TTL:
+        return list(_MODELS_CACHE["models"])
+
+    url = f"{OLLAMA_BASE_URL}/api/tags"
+    try:
+        response = SESSION.get(url)
+        response.raise_for_status()
+        models = [m["name"] for m in _json.loads(response.content).get("models", [])]
+    except (requests.RequestException, ValueError):
+        return []
+
+    _MODELS_CACHE.update(time=now, models=models)
+    return list(models)
+
+
+def generate_simple(
+    prompt: str,
+    model: str,
+    system: str = "",
+    temperature: float = 0.3,
+    options: Optional[dict] = None,
+) -> str:
+    """
+    Generate a simple non-streaming response.
+    options are extra Ollama model options (num_ctx, num_predict, ...).
+    """
+    url = f"{OLLAMA_BASE_URL}/api/generate"
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "system": system,
+        "options": _model_options(temperature, options),
+        "stream": False,
+    }
+
+    response = _post_json(url, payload)
+    response.raise_for_status()
+    return _json.loads(response.content).get("response", "")
+
+
+def _split_lines(buffer: bytes) -> tuple[list[bytes], bytes]:
+    """Split buffered NDJSON into its complete, non-blank lines and the rest."""
+    lines = []
+    start = 0
+    newline = buffer.find(b"\n")
+    while newline >= 0:
+        line = buffer[start:newline]
+        if line.strip():
+            lines.append(line)
+        start = newline + 1
+        newline = buffer.find(b"\n", start)
+    return lines, buffer[start:]
+
+
+def _iter_json_lines(response):
+    """
+    Yield parsed objects from a streamed NDJSON response.
+
+    Splits raw network chunks on newlines directly instead of going through
+    iter_lines(), which re-buffers and re-splits every chunk in Python.
+    Ollama streams with chunked encoding, so chunk_size=None hands each
+    chunk over as soon as it arrives.
+    """
+    buffer = b""
+    for raw in response.iter_content(chunk_size=None):
+        lines, buffer = _split_lines(buffer + raw)
+        for line in lines:
+            yield _json.loads(line)
+    if buffer.strip():
+        yield _json.loads(buffer)
+
+
+async def _aiter_json_lines(response):
+    """Async counterpart of _iter_json_lines() for httpx streaming responses."""
+    buffer = b""
+    async for raw in response.aiter_bytes():
+        lines, buffer = _split_lines(buffer + raw)
+        for line in lines:
+            yield _json.loads(line)
+    if buffer.strip():
+        yield _json.loads(buffer)
+
+
+def chat_stream(messages: list[dict], model: str, temperature: float = 0.7):
+    """
+    Stream a chat response, yielding content chunks as they arrive.
+    Closing the generator early closes the HTTP response (Ollama then stops
+    generating).
+    """
+    url = f"{OLLAMA_BASE_URL}/api/chat"
+    payload = {
+        "model": model,
+        "messages": messages,
+        "options": _model_options(temperature),
+        "stream": True,
+    }
+
+    with _post_json(url, payload, stream=True) as response:
+        response.raise_for_status()
+        # Reading to the end of the stream (rather than stopping at "done")
+        # lets the connection go back to the pool for reuse
+        for data in _iter_json_lines(response):
+            chunk = data.get("message", {}).get("content", "")
+            if chunk:
+                yield chunk
+
+
+def print_stream(chunks) -> str:
+    """
+    Print streamed chunks as they arrive and return the full response.
+
+    Output is coalesced: text is flushed once STREAM_FLUSH_CHARS have built
+    up or STREAM_FLUSH_SECONDS have passed, rather than one write per token.
+    The first chunk is always shown immediately.
+    """
+    parts = []
+    pending = ""
+    last_flush = float("-inf")
+    for chunk in chunks:
+        parts.append(chunk)
+        pending += chunk
+        now = time.monotonic()
+        if (
+            len(pending) >= STREAM_FLUSH_CHARS
+            or now - last_flush >= STREAM_FLUSH_SECONDS
+        ):
+            print(pending, end="", flush=True)
+            pending = ""
+            last_flush = now
+    print(pending)  # remainder plus the newline at the end
+    return "".join(parts)
+
+
+def chat(
+    messages: list[dict], model: str, temperature: float = 0.7, stream: bool = True
+) -> str:
+    """Chat with the specified Ollama model using message history."""
+    if stream:
+        return print_stream(chat_stream(messages, model, temperature))
+
+    url = f"{OLLAMA_BASE_URL}/api/chat"
+    payload = {
+        "model": model,
+        "messages": messages,
+        "options": _model_options(temperature),
+        "stream": False,
+    }
+
+    response = _post_json(url, payload)
+    response.raise_for_status()
+    return _json.loads(response.content).get("message", {}).get("content", "")
+
+
+def _async_client():
+    """Return the shared httpx.AsyncClient for the running event loop."""
+    global _ASYNC_CLIENT, _ASYNC_CLIENT_LOOP
+    if httpx is None:
+        raise ImportError("chat_async requires httpx (pip install httpx)")
+    loop = asyncio.get_running_loop()
+    if (
+        _ASYNC_CLIENT is None
+        or _ASYNC_CLIENT.is_closed
+        or _ASYNC_CLIENT_LOOP is not loop
+    ):
+        # timeout=None matches requests' default (model loads can take a while)
+        _ASYNC_CLIENT = httpx.AsyncClient(
+            timeout=None,
+            trust_env=SESSION.trust_env,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+        )
+        _ASYNC_CLIENT_LOOP = loop
+    return _ASYNC_CLIENT
+
+
+async def chat_async(messages: list[dict], model: str, temperature: float = 0.7):
+    """
+    Async counterpart of chat() for event-loop frontends.
+    Yields content chunks as they stream in, so concurrent sessions don't
+    block each other on socket reads. All calls share one keep-alive client.
+    """
+    url = f"{OLLAMA_BASE_URL}/api/chat"
+    payload = {
+        "model": model,
+        "messages": messages,
+        "options": _model_options(temperature),
+        "stream": True,
+    }
+
+    async with _async_client().stream(
+        "POST", url, content=_json.dumps(payload), headers=_JSON_HEADERS
+    ) as response:
+        response.raise_for_status()
+        async for data in _aiter_json_lines(response):
+            chunk = data.get("message", {}).get("content", "")
+            if chunk:
+                yield chunk
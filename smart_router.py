@@ -9,17 +9,48 @@ This is more intelligent than keyword-based routing because the AI
 understands context, nuance, and intent.
 
 Usage:
-    python smart_router.py
+    python smart_router.py                # local classifier if router.onnx exists
+    python smart_router.py --llm-router   # always use the router LLM
+    python smart_router.py --warm         # load all models before the first question
+
+    # With an Ollama server started with OLLAMA_NUM_PARALLEL>=2, the normal
+    # tier starts answering while the router is still classifying:
+    OLLAMA_NUM_PARALLEL=2 python smart_router.py
 
 Requires Ollama running locally with all models available.
 """
 
+import argparse
+import itertools
 import json
 import math
-import re
+import os
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 import requests
 
-OLLAMA_BASE_URL = "http://localhost:11434"
+try:
+    import numpy as np  # Optional: pip install numpy
+except ImportError:
+    np = None
+
+try:
+    import onnxruntime  # Optional: pip install onnxruntime
+except ImportError:
+    onnxruntime = None
+
+from ollama_io import (
+    chat,
+    chat_stream,
+    generate_simple,
+    list_models,
+    print_stream,
+    trim_history,
+    warm_models,
+)
+from routing_client import SIMPLE_GREETINGS, is_simple_query
 
 # Temperature distribution: Gaussian around 0.7
 # This makes 0.7 most likely, with values tapering off toward extremes
@@ -34,6 +65,43 @@ FAST_MODEL = "quick-tutor"  # ~1GB - Snappy micro-learning
 NORMAL_MODEL = "balanced-tutor"  # ~4GB - Socratic dialogue
 STRONG_MODEL = "deep-tutor"  # ~9GB - Academic rigor
 
+# Per-tier display info: (icon, label, model)
+_TIERS = {
+    "fast": ("🚀", "fast", FAST_MODEL),
+    "normal": ("⚡", "good", NORMAL_MODEL),
+    "strong": ("🧠", "strong", STRONG_MODEL),
+}
+
+# Prompts shorter than this that match the keyword classifier's simple-query
+# patterns skip the router model entirely (greetings, "thanks", "what is X?", ...)
+SHORT_PROMPT_WORDS = 4
+
+# Speculative streaming: while the router model classifies, start the answer
+# on the NORMAL tier (the most common outcome) and keep it if the router
+# picks that tier. A kept stream keeps its own temperature (TEMP_MEAN, or the
+# /temp value). Needs an Ollama server that runs requests in parallel.
+SPECULATIVE_TIER = "normal"
+
+# Messages kept per tier (10 user/assistant turns); older ones drop off.
+# Long conversations are trimmed further to a size budget (trim_history).
+MAX_HISTORY_MESSAGES = 20
+
+# Optional distilled router: a text classifier (e.g. TF-IDF + LogisticRegression
+# trained offline on labels produced by ROUTER_MODEL) exported with skl2onnx.
+# Expected contract: one string input of shape [N, 1], first output = labels
+# ("fast" / "normal" / "strong"). An optional float output named
+# LOCAL_ROUTER_TEMP_OUTPUT (e.g. a regressor on the router's temperatures)
+# supplies the base temperature. When present it replaces the LLM round-trip.
+LOCAL_ROUTER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "router.onnx"
+)
+LOCAL_ROUTER_TEMP_OUTPUT = "temperature"
+
+# Ollama options for router calls. The reply is one short JSON object, and
+# the context only has to hold the system prompt (~450 tokens) plus the
+# query, so a small KV cache and output cap keep classification cheap.
+ROUTER_OPTIONS = {"num_predict": 80, "num_ctx": 2048}
+
 # Router system prompt
 ROUTER_SYSTEM_PROMPT = """You are a query classifier. Analyze the user's question and decide:
 
@@ -70,36 +138,30 @@ User: "Debug this Python code: def foo(): return x"
 {"difficulty": "strong", "temperature": 0.3, "reason": "Code debugging needs precision"}"""
 
 
-def list_models() -> list[str]:
-    """List all available models in local Ollama instance."""
-    url = f"{OLLAMA_BASE_URL}/api/tags"
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return [m["name"] for m in response.json().get("models", [])]
-    except requests.RequestException:
-        return []
-
-
-def generate_simple(
-    prompt: str, model: str, system: str = "", temperature: float = 0.3
-) -> str:
-    """Generate a simple non-streaming response."""
-    url = f"{OLLAMA_BASE_URL}/api/generate"
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "system": system,
-        "temperature": temperature,
-        "stream": False,
-    }
+def _gaussian_temperature(base_temp: float) -> float:
+    """Full-precision Gaussian adjustment (see apply_gaussian_temperature)."""
+    # Calculate how far this temperature is from the mean
+    distance_from_mean = abs(base_temp - TEMP_MEAN)
+
+    # Apply Gaussian weighting: exp(-distance²/(2*sigma²))
+    # This creates a bell curve centered at TEMP_MEAN
+    gaussian_weight = math.exp(-(distance_from_mean**2) / (2 * TEMP_SIGMA**2))
+
+    # Blend the base temperature with the mean based on Gaussian weight
+    # Higher weight = stay closer to base_temp
+    # Lower weight = move toward mean (0.7)
+    adjusted_temp = base_temp * gaussian_weight + TEMP_MEAN * (1 - gaussian_weight)
 
-    response = requests.post(url, json=payload)
-    response.raise_for_status()
-    return response.json().get("response", "")
+    # Clamp to valid range
+    return max(0.0, min(1.0, adjusted_temp))
 
 
-def apply_gaussian_temperature(base_temp: float) -> float:
+# Router temperatures are 0.0-1.0 in coarse steps, so precompute the
+# adjustment on a 0.01 grid and look it up instead of calling math.exp
+_GAUSSIAN_LUT = tuple(_gaussian_temperature(i / 100) for i in range(101))
+
+
+def apply_gaussian_temperature(base_temp: float, exact: bool = False) -> float:
     """
     Transform temperature using Gaussian distribution around 0.7.
 
@@ -111,63 +173,223 @@ def apply_gaussian_temperature(base_temp: float) -> float:
 
     Args:
         base_temp: Temperature suggested by the router (0.0-1.0)
+        exact: Skip the 0.01-step lookup table and compute the exact value
 
     Returns:
         Adjusted temperature that prefers to be near 0.7
     """
-    # Calculate how far this temperature is from the mean
-    distance_from_mean = abs(base_temp - TEMP_MEAN)
+    if exact or not 0.0 <= base_temp <= 1.0:
+        return _gaussian_temperature(base_temp)
+    return _GAUSSIAN_LUT[round(base_temp * 100)]
 
-    # Apply Gaussian weighting: exp(-distance²/(2*sigma²))
-    # This creates a bell curve centered at TEMP_MEAN
-    gaussian_weight = math.exp(-(distance_from_mean**2) / (2 * TEMP_SIGMA**2))
 
-    # Blend the base temperature with the mean based on Gaussian weight
-    # Higher weight = stay closer to base_temp
-    # Lower weight = move toward mean (0.7)
-    adjusted_temp = base_temp * gaussian_weight + TEMP_MEAN * (1 - gaussian_weight)
+def apply_gaussian_temperature_batch(base_temps):
+    """
+    Vectorized apply_gaussian_temperature for a batch of temperatures
+    (e.g. when evaluating the router over a dataset of prompts).
 
-    # Clamp to valid range
-    return max(0.0, min(1.0, adjusted_temp))
+    Returns a NumPy array when NumPy is installed, otherwise a list.
+    """
+    if np is None:
+        return [apply_gaussian_temperature(t, exact=True) for t in base_temps]
+
+    temps = np.asarray(base_temps, dtype=float)
+    distance_from_mean = np.abs(temps - TEMP_MEAN)
+    gaussian_weight = np.exp(-(distance_from_mean**2) / (2 * TEMP_SIGMA**2))
+    adjusted = temps * gaussian_weight + TEMP_MEAN * (1 - gaussian_weight)
+    return np.clip(adjusted, 0.0, 1.0)
+
+
+def load_local_router(path: str = LOCAL_ROUTER_PATH):
+    """Load the optional ONNX router, or return None if it is unavailable."""
+    if onnxruntime is None or not os.path.exists(path):
+        return None
+    try:
+        return onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+    except Exception as e:  # onnxruntime errors derive from Exception
+        print(f"⚠️  Local router unusable ({os.path.basename(path)}): {e}")
+        print("   Using the router model instead")
+        return None
+
+
+def classify_local(user_prompt: str, local_router) -> dict:
+    """
+    Classify the query with the local ONNX router (sub-millisecond on CPU).
+    If the model has no LOCAL_ROUTER_TEMP_OUTPUT output, temperature stays
+    at the peak of the Gaussian (TEMP_MEAN).
+    """
+    input_name = local_router.get_inputs()[0].name
+    output_names = [output.name for output in local_router.get_outputs()]
+    results = local_router.run(None, {input_name: [[user_prompt]]})
+
+    difficulty = str(results[0][0])
+    if difficulty not in _TIERS:
+        difficulty = "normal"
 
+    base_temperature = TEMP_MEAN
+    if LOCAL_ROUTER_TEMP_OUTPUT in output_names:
+        predicted = results[output_names.index(LOCAL_ROUTER_TEMP_OUTPUT)]
+        base_temperature = max(0.0, min(1.0, float(predicted.ravel()[0])))
 
-def classify_with_ai(user_prompt: str) -> dict:
+    return {
+        "difficulty": difficulty,
+        "temperature": apply_gaussian_temperature(base_temperature),
+        "reason": "Local classifier",
+    }
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def extract_json_object(text: str) -> Optional[dict]:
+    """
+    Return the first valid JSON object embedded in text, or None.
+    Unlike a regex match, this handles nested braces and skips over any
+    stray "{" that doesn't start valid JSON.
+    """
+    start = text.find("{")
+    while start >= 0:
+        try:
+            parsed, _ = _JSON_DECODER.raw_decode(text, start)
+            return parsed
+        except json.JSONDecodeError:
+            start = text.find("{", start + 1)
+    return None
+
+
+def _normalize(user_prompt: str) -> str:
+    """Lowercase and collapse whitespace so trivial variants share a cache entry."""
+    return " ".join(user_prompt.lower().split())
+
+
+def _classify_with_router(user_prompt: str) -> tuple[str, float, str]:
+    """
+    Ask the router model for (difficulty, temperature, reason).
+    Raises on any failure.
+    """
+    result = generate_simple(
+        prompt=f"Classify this query:\n\n{user_prompt}",
+        model=ROUTER_MODEL,
+        system=ROUTER_SYSTEM_PROMPT,
+        temperature=0.2,  # Low temp for consistent classification
+        options=ROUTER_OPTIONS,
+    )
+
+    # Parse JSON from response
+    parsed = extract_json_object(result)
+    if parsed is None:
+        raise ValueError("no JSON object in router output")
+
+    # Validate and normalize
+    difficulty = parsed.get("difficulty", "normal").lower()
+    if difficulty not in _TIERS:
+        difficulty = "normal"
+
+    base_temperature = float(parsed.get("temperature", 0.7))
+    base_temperature = max(0.0, min(1.0, base_temperature))  # Clamp to 0-1
+
+    # Apply Gaussian distribution to prefer 0.7
+    temperature = apply_gaussian_temperature(base_temperature)
+
+    reason = parsed.get("reason", "AI classification")
+
+    return difficulty, temperature, reason
+
+
+# Router verdicts (LRU), keyed by the _normalize()d prompt
+ROUTER_CACHE_SIZE = 1024
+_ROUTER_CACHE: OrderedDict[str, tuple[str, float, str]] = OrderedDict()
+_ROUTER_CACHE_STATS = {"hits": 0, "misses": 0}
+
+
+def _classify_cached(user_prompt: str) -> tuple[str, float, str]:
+    """
+    _classify_with_router() memoized on the normalized prompt. The router
+    still sees the original text (case, newlines and indentation are part of
+    what it classifies on). Failures raise and are never cached.
+    """
+    key = _normalize(user_prompt)
+    cached = _ROUTER_CACHE.get(key)
+    if cached is not None:
+        _ROUTER_CACHE_STATS["hits"] += 1
+        _ROUTER_CACHE.move_to_end(key)
+        return cached
+
+    _ROUTER_CACHE_STATS["misses"] += 1
+    result = _classify_with_router(user_prompt)
+    _ROUTER_CACHE[key] = result
+    if len(_ROUTER_CACHE) > ROUTER_CACHE_SIZE:
+        _ROUTER_CACHE.popitem(last=False)
+    return result
+
+
+def router_cache_info() -> dict:
+    """Hit/miss counts and size of the router cache (for hit-rate metrics)."""
+    return {
+        **_ROUTER_CACHE_STATS,
+        "maxsize": ROUTER_CACHE_SIZE,
+        "currsize": len(_ROUTER_CACHE),
+    }
+
+
+def clear_router_cache() -> None:
+    """Empty the router cache and reset its statistics."""
+    _ROUTER_CACHE.clear()
+    _ROUTER_CACHE_STATS.update(hits=0, misses=0)
+
+
+def _is_greeting(prompt_lower: str) -> bool:
+    """Greetings with trailing punctuation too ("hi!", "thank you.", "ok!")."""
+    return prompt_lower.rstrip("!. ") in SIMPLE_GREETINGS
+
+
+def is_fast_path(user_prompt: str) -> bool:
+    """
+    True for short prompts matching the simple-query patterns, including
+    greetings with trailing "!" or ".". Other short prompts ("Riemann zeta
+    zeros") still go to the router.
+    """
+    if len(user_prompt.split(maxsplit=SHORT_PROMPT_WORDS)) >= SHORT_PROMPT_WORDS:
+        return False
+    prompt_lower = user_prompt.lower().strip()
+    return _is_greeting(prompt_lower) or is_simple_query(prompt_lower)
+
+
+def classify_with_ai(user_prompt: str, local_router=None) -> dict:
     """
     Use the small router model to classify the query.
     Returns dict with 'difficulty', 'temperature', and 'reason'.
     Temperature is adjusted to follow Gaussian distribution around 0.7.
+    Successful classifications are memoized per prompt.
+
+    Short prompts that match the keyword classifier's simple-query patterns
+    (greetings, "what is X?", definitions, ...) return immediately; other
+    short prompts are classified like any other. Otherwise a local ONNX
+    router, if given, is tried first; the router LLM is only used when it
+    fails.
     """
-    try:
-        result = generate_simple(
-            prompt=f"Classify this query:\n\n{user_prompt}",
-            model=ROUTER_MODEL,
-            system=ROUTER_SYSTEM_PROMPT,
-            temperature=0.2,  # Low temp for consistent classification
-        )
+    # Fast path: short, simple prompts don't need a router round-trip
+    if is_fast_path(user_prompt):
+        return {
+            "difficulty": "fast",
+            "temperature": TEMP_MEAN,
+            "reason": "Short prompt fast-path",
+        }
+
+    if local_router is not None:
+        try:
+            return classify_local(user_prompt, local_router)
+        except Exception as e:  # onnxruntime errors derive from Exception
+            print(f"  ⚠️ Local router error: {e}, using router model")
 
-        # Parse JSON from response
-        # Try to extract JSON from the response
-        json_match = re.search(r"\{[^}]+\}", result)
-        if json_match:
-            parsed = json.loads(json_match.group())
-            # Validate and normalize
-            difficulty = parsed.get("difficulty", "normal").lower()
-            if difficulty not in ["fast", "normal", "strong"]:
-                difficulty = "normal"
-
-            base_temperature = float(parsed.get("temperature", 0.7))
-            base_temperature = max(0.0, min(1.0, base_temperature))  # Clamp to 0-1
-
-            # Apply Gaussian distribution to prefer 0.7
-            temperature = apply_gaussian_temperature(base_temperature)
-
-            reason = parsed.get("reason", "AI classification")
-
-            return {
-                "difficulty": difficulty,
-                "temperature": temperature,
-                "reason": reason,
-            }
+    try:
+        difficulty, temperature, reason = _classify_cached(user_prompt)
+        # Fresh dict per call: callers may override the temperature
+        return {
+            "difficulty": difficulty,
+            "temperature": temperature,
+            "reason": reason,
+        }
     except (json.JSONDecodeError, requests.RequestException, ValueError) as e:
         print(f"  ⚠️ Router error: {e}, using fallback")
 
@@ -179,36 +401,33 @@ def classify_with_ai(user_prompt: str) -> dict:
     }
 
 
-def chat(
-    messages: list[dict], model: str, temperature: float = 0.7, stream: bool = True
-) -> str:
-    """Chat with the specified Ollama model using message history."""
-    url = f"{OLLAMA_BASE_URL}/api/chat"
-    payload = {
-        "model": model,
-        "messages": messages,
-        "temperature": temperature,
-        "stream": stream,
-    }
+def speculation_enabled() -> bool:
+    """Speculative streaming only pays off if Ollama serves requests in parallel."""
+    try:
+        return int(os.environ.get("OLLAMA_NUM_PARALLEL", "1")) >= 2
+    except ValueError:
+        return False
+
+
+def _start_stream(messages: list[dict], model: str, temperature: float):
+    """Open a chat stream and wait for its first chunk: (stream, first_chunk)."""
+    stream = chat_stream(messages, model=model, temperature=temperature)
+    return stream, next(stream, "")
 
-    response = requests.post(url, json=payload, stream=stream)
-    response.raise_for_status()
-
-    if stream:
-        full_response = ""
-        for line in response.iter_lines():
-            if line:
-                data = json.loads(line)
-                chunk = data.get("message", {}).get("content", "")
-                if chunk:
-                    print(chunk, end="", flush=True)
-                    full_response += chunk
-                if data.get("done"):
-                    print()  # newline at the end
-                    break
-        return full_response
-    else:
-        return response.json().get("message", {}).get("content", "")
+
+def _discard_stream(future) -> None:
+    """Close a speculative stream once it has started, without waiting for it."""
+
+    def close(done):
+        if done.exception() is None:
+            done.result()[0].close()
+
+    future.add_done_callback(close)
+
+
+def get_tier_info(difficulty: str) -> tuple[str, str, str]:
+    """Return (icon, label, model) for a tier; unknown tiers map to strong."""
+    return _TIERS.get(difficulty, _TIERS["strong"])
 
 
 def print_config():
@@ -224,14 +443,14 @@ def print_config():
     print(f"║  🧠 Strong Model: {STRONG_MODEL:<43} ║")
     print("╠════════════════════════════════════════════════════════════════╣")
 
-    router_ok = any(ROUTER_MODEL.split(":")[0] in m for m in available)
-    fast_ok = any(FAST_MODEL.split(":")[0] in m or FAST_MODEL in m for m in available)
-    normal_ok = any(
-        NORMAL_MODEL.split(":")[0] in m or NORMAL_MODEL in m for m in available
-    )
-    strong_ok = any(
-        STRONG_MODEL.split(":")[0] in m or STRONG_MODEL in m for m in available
-    )
+    # Installed names with and without their ":tag", for O(1) lookups.
+    # A tagged name ("qwen2.5:1.5b") must match exactly; a bare name matches
+    # any installed tag of that model.
+    prefixes = {m.split(":", 1)[0] for m in available} | set(available)
+    router_ok = ROUTER_MODEL in prefixes
+    fast_ok = FAST_MODEL in prefixes
+    normal_ok = NORMAL_MODEL in prefixes
+    strong_ok = STRONG_MODEL in prefixes
 
     print(f"║  Router Available: {'✓ Yes' if router_ok else '✗ No':<42} ║")
     print(f"║  Fast Available:   {'✓ Yes' if fast_ok else '✗ No':<42} ║")
@@ -275,11 +494,45 @@ def print_config():
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Smart Router - AI-powered query classification"
+    )
+    parser.add_argument(
+        "--llm-router",
+        action="store_true",
+        help="always classify with the router LLM, even if router.onnx is present",
+    )
+    parser.add_argument(
+        "--warm",
+        action="store_true",
+        help="load all models into memory at startup",
+    )
+    args = parser.parse_args()
+
     print_config()
 
-    messages_fast = []  # Separate history for fast model
-    messages_normal = []  # Separate history for normal model
-    messages_strong = []  # Separate history for strong model
+    local_router = None if args.llm_router else load_local_router()
+    if local_router is not None:
+        print(
+            f"→ Using local router classifier ({os.path.basename(LOCAL_ROUTER_PATH)})"
+        )
+
+    if args.warm:
+        print("→ Loading models...", end=" ", flush=True)
+        models = [m for _, _, m in _TIERS.values()]
+        if local_router is None:
+            models.insert(0, ROUTER_MODEL)
+        failed = warm_models(models, options={ROUTER_MODEL: ROUTER_OPTIONS})
+        print(f"failed: {', '.join(failed)}" if failed else "done")
+
+    speculative_executor = None
+    last_speculative = None  # Most recent speculative stream (may be discarded)
+    if local_router is None and speculation_enabled():
+        speculative_executor = ThreadPoolExecutor(max_workers=1)
+        print(f"→ Speculative streaming on the {SPECULATIVE_TIER} tier enabled")
+
+    # Separate, bounded history per tier
+    histories = {tier: deque(maxlen=MAX_HISTORY_MESSAGES) for tier in _TIERS}
 
     force_mode = None  # None = AI routing, 'fast', 'normal', or 'strong'
     fixed_temp = None  # None = AI decides, or fixed value
@@ -315,6 +568,7 @@ def main():
         elif user_input.lower() == "/auto":
             force_mode = None
             fixed_temp = None
+            clear_router_cache()
             print("→ AI routing enabled (model + temperature)")
             continue
         elif user_input.lower().startswith("/temp "):
@@ -326,49 +580,58 @@ def main():
                 print("→ Usage: /temp 0.7")
             continue
         elif user_input.lower() == "/models":
-            models = list_models()
+            models = list_models(refresh=True)
             print("Available models:", ", ".join(models) if models else "None found")
             continue
 
-        # Classify with AI or use forced mode
+        # Forced mode: the tier and temperature are known, so skip the router
+        # (and speculation) entirely
+        speculative = None
         if force_mode:
-            classification = {
-                "difficulty": force_mode,
-                "temperature": fixed_temp if fixed_temp is not None else 0.7,
-                "reason": "Forced by user",
-            }
+            difficulty = force_mode
+            temperature = fixed_temp if fixed_temp is not None else 0.7
             force_mode = None  # Reset after use
         else:
+            # A discarded stream still waiting for its first token (e.g. during
+            # a model load) would hold the worker, so don't queue behind it
+            if (
+                speculative_executor is not None
+                and (last_speculative is None or last_speculative.done())
+                and not is_fast_path(user_input)
+            ):
+                # Overlap the router call with the NORMAL tier's first token
+                speculative_temp = fixed_temp if fixed_temp is not None else TEMP_MEAN
+                speculative_messages = list(histories[SPECULATIVE_TIER])
+                speculative_messages.append({"role": "user", "content": user_input})
+                trim_history(speculative_messages)
+                speculative = speculative_executor.submit(
+                    _start_stream, speculative_messages, NORMAL_MODEL, speculative_temp
+                )
+                last_speculative = speculative
             print("  🔀 Analyzing query...", end=" ", flush=True)
-            classification = classify_with_ai(user_input)
+            classification = classify_with_ai(user_input, local_router)
             print(f"[{classification['reason']}]")
 
-        # Apply fixed temp if set
-        if fixed_temp is not None:
-            classification["temperature"] = fixed_temp
-
-        # Select model and message history based on classification
-        difficulty = classification["difficulty"]
-        temperature = classification["temperature"]
-
-        if difficulty == "fast":
-            model = FAST_MODEL
-            messages = messages_fast
-            tier_icon = "🚀"
-            tier_label = "fast"
-        elif difficulty == "normal":
-            model = NORMAL_MODEL
-            messages = messages_normal
-            tier_icon = "⚡"
-            tier_label = "good"
-        else:  # strong
-            model = STRONG_MODEL
-            messages = messages_strong
-            tier_icon = "🧠"
-            tier_label = "strong"
+            # A fixed temperature overrides the router's choice
+            difficulty = classification["difficulty"]
+            temperature = (
+                fixed_temp if fixed_temp is not None else classification["temperature"]
+            )
+
+            if speculative is not None:
+                if difficulty == SPECULATIVE_TIER:
+                    temperature = speculative_temp  # What the stream actually uses
+                else:
+                    _discard_stream(speculative)
+                    speculative = None
+
+        # Select model and message history for the tier
+        tier_icon, tier_label, model = get_tier_info(difficulty)
 
         # Add user message
+        messages = histories[difficulty]
         messages.append({"role": "user", "content": user_input})
+        trim_history(messages)
 
         # Show which model and temperature is being used
         print(
@@ -378,9 +641,13 @@ def main():
         )
 
         try:
-            ai_response = chat(
-                messages, model=model, temperature=temperature, stream=True
-            )
+            if speculative is not None:
+                stream, first_chunk = speculative.result()
+                ai_response = print_stream(itertools.chain([first_chunk], stream))
+            else:
+                ai_response = chat(
+                    list(messages), model=model, temperature=temperature, stream=True
+                )
             messages.append({"role": "assistant", "content": ai_response})
         except requests.RequestException as e:
             print(f"\n❌ Error: {e}")